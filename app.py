@@ -1,14 +1,12 @@
 import streamlit as st
 import os
-from docx import Document
-from pypdf import PdfReader
 from langdetect import detect
-import requests
-from azure.ai.translation.text import TextTranslationClient
-from azure.core.credentials import AzureKeyCredential
-from openai import OpenAI
+import orjson
 import io
 import time
+import asyncio
+import hashlib
+import re
 
 
 # ------------------------------------------------------------
@@ -20,30 +18,72 @@ AZURE_TRANSLATOR_KEY = os.getenv("AZURE_TRANSLATOR_KEY")
 AZURE_TRANSLATOR_ENDPOINT = os.getenv("AZURE_TRANSLATOR_ENDPOINT", "https://salahalali.cognitiveservices.azure.com/")
 AZURE_TRANSLATOR_REGION = os.getenv("AZURE_TRANSLATOR_REGION", "qatarcentral")
 
-translator_client = TextTranslationClient(
-    endpoint=AZURE_TRANSLATOR_ENDPOINT,
-    credential=AzureKeyCredential(AZURE_TRANSLATOR_KEY)
-)
-
 # HuggingFace
 HF_MODEL_ID = "llmware/industry-bert-contracts-v0.1"
 HF_TOKEN = os.getenv("HF_TOKEN")
 
+# Prompt sent to the HF model; the country clause and the "favoured party"
+# item are the only parts that vary between requests.
+_HF_PROMPT = """Based on the following text that is taken from a contract document{country_clause}
+analyze it for:
+{favour_item}1 - Key contract information and parties
+2 - Missing critical information
+3 - Potential legal risks and non-standard clauses
+4 - Recommendations for improvements
+5 - Overall legal assessment
+Text from legal document: {text}"""
+_HF_FAVOUR_ITEM = '0- which parties does this conract fevor more "answer only by it name at first line"?\n'
+
+# "Page N" / "Page N of M" footers and confidentiality banners
+_BOILERPLATE_LINE_RE = re.compile(r"^(page\s+\d+(\s+of\s+\d+)?|confidential)$", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# PDF extraction. PyMuPDF's default "text" mode already orders text by
+# layout, which covers multi-column contracts; "blocks" is offered for
+# layouts where that still interleaves columns. Heavier layout analysers
+# such as pdfminer.six are several times slower and are not needed here.
+PDF_TEXT_MODES = ("text", "blocks")
+PDF_EXTRACT_BUDGET_S = 30
+# Shorter PDFs skip the scanned-document probe; a full pass is just as cheap
+PDF_SCAN_PROBE_MIN_PAGES = 8
+
+# Extracted text is kept in memory for at most this many uploads. Writing it
+# to Streamlit's disk cache is opt-in (EXTRACT_CACHE_PERSIST=1): disk entries
+# are never evicted, and contract contents should not linger on the server.
+EXTRACT_CACHE_MAX_ENTRIES = 32
+EXTRACT_CACHE_PERSIST = "disk" if os.getenv("EXTRACT_CACHE_PERSIST") == "1" else None
+
+# Translations and language detections kept in memory; each entry can hold
+# a whole document, so they are bounded like the extraction cache
+TEXT_CACHE_MAX_ENTRIES = 64
+
+# Characters of the document shown in the content preview
+PREVIEW_LIMIT = 50_000
+
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize clients
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Sentence boundary used to hand streamed chat output to the translator; the
+# whitespace is kept with the sentence so line and paragraph breaks survive
+_SENTENCE_END_RE = re.compile(r"[.!?]\s+")
+# "1. " / "2) " list markers end like a sentence but must stay with their item
+_LIST_MARKER_RE = re.compile(r"\s*\d+[.)]\s*")
 
 # Initialize session state
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'analysis_result' not in st.session_state:
     st.session_state.analysis_result = None
+if 'analysis_chunks' not in st.session_state:
+    st.session_state.analysis_chunks = None
 if 'original_language' not in st.session_state:
     st.session_state.original_language = None
 if 'hf_result' not in st.session_state:
     st.session_state.hf_result = None
+if 'hf_key' not in st.session_state:
+    st.session_state.hf_key = None
+if 'processed_doc' not in st.session_state:
+    st.session_state.processed_doc = None
 if 'hf_token' not in st.session_state:
     st.session_state.hf_token = HF_TOKEN or ""
 
@@ -95,58 +135,218 @@ if 'hf_token' not in st.session_state:
 #     except Exception as e:
 #         return "Error: Could not get response from ChatGPT"
 
+# The Azure client is built on first use so the landing page does not pay
+# for importing the SDK.
+@st.cache_resource(show_spinner=False)
+def get_translator():
+    """Return the shared Azure Translator client."""
+    from azure.ai.translation.text import TextTranslationClient
+    from azure.core.credentials import AzureKeyCredential
+
+    return TextTranslationClient(
+        endpoint=AZURE_TRANSLATOR_ENDPOINT,
+        credential=AzureKeyCredential(AZURE_TRANSLATOR_KEY)
+    )
+
+def _azure_translate(translator, text, to_language):
+    """Translate one text with the given Azure Translator client."""
+    response = translator.translate(
+        body=[{"text": text}],
+        to_language=[to_language]
+    )
+    return response[0].translations[0].text
+
+@st.cache_data(show_spinner=False, max_entries=TEXT_CACHE_MAX_ENTRIES)
+def _translate(text, to_language):
+    """Cached Azure Translator call; raises so failures are never cached."""
+    return _azure_translate(get_translator(), text, to_language)
+
 def translate_text(text, to_language="en"):
     """Translate text to target language using Azure Translator."""
     try:
-        response = translator_client.translate(
-            body=[{"text": text}],
-            to_language=[to_language]
-        )
-        return response[0].translations[0].text
+        return _translate(text, to_language)
     except Exception as e:
         st.error(f"Translation error: {e}")
         return text
 
-def extract_text_from_file(file):
-    """Extract text from DOCX, PDF, or TXT file."""
-    if file.name.endswith(".pdf"):
-        pdf = PdfReader(io.BytesIO(file.read()))
-        return "\n".join([page.extract_text() or "" for page in pdf.pages]), len(pdf.pages)
-    elif file.name.endswith(".docx"):
-        doc = Document(io.BytesIO(file.read()))
-        return "\n".join([para.text for para in doc.paragraphs]), len(doc.paragraphs) // 20 + 1
-    else:
-        text = file.read().decode("utf-8", errors="ignore")
-        return text, len(text.split('\n'))
+@st.cache_data(show_spinner=False, max_entries=TEXT_CACHE_MAX_ENTRIES)
+def detect_language(sample):
+    """Detect the language of a text sample (cached across reruns)."""
+    return detect(sample)
+
+def _pdf_page_text(page, mode):
+    """Return one page's text in the given PDF_TEXT_MODES mode."""
+    if mode == "blocks":
+        # (x0, y0, x1, y1, text, block_no, block_type); type 0 is text
+        blocks = page.get_text("blocks", sort=True)
+        return "\n".join(b[4] for b in blocks if b[6] == 0)
+    return page.get_text("text")
+
+def _pdf_text(pdf, mode="text", known=None):
+    """Join the text of every page, stopping once PDF_EXTRACT_BUDGET_S is spent.
+
+    ``known`` maps page indexes to text already extracted in ``mode``.
+    Returns (text, truncated). PyMuPDF documents are not thread-safe, so
+    pages are read sequentially.
+    """
+    known = known or {}
+    start = time.monotonic()
+    parts = []
+    for i, page in enumerate(pdf):
+        parts.append(known[i] if i in known else _pdf_page_text(page, mode))
+        if len(parts) < pdf.page_count and time.monotonic() - start > PDF_EXTRACT_BUDGET_S:
+            return "\n".join(parts), True
+    return "\n".join(parts), False
+
+def _extract_pdf(file_bytes, pdf_mode):
+    """Extract text, page count and a truncation flag from PDF bytes."""
+    import pymupdf
+
+    with pymupdf.open(stream=file_bytes, filetype="pdf") as pdf:
+        probed = {}
+        if pdf.page_count >= PDF_SCAN_PROBE_MIN_PAGES:
+            # Scanned contracts have no text layer: if the first, middle and
+            # last pages are all empty, skip walking every page for nothing.
+            for i in (0, pdf.page_count // 2, pdf.page_count - 1):
+                probed[i] = _pdf_page_text(pdf[i], pdf_mode)
+            if not any(t.strip() for t in probed.values()):
+                return "", pdf.page_count, False
+        text, truncated = _pdf_text(pdf, pdf_mode, known=probed)
+        return text, pdf.page_count, truncated
+
+def _extract_docx(file_bytes, pdf_mode):
+    """Extract text and an estimated page count from DOCX bytes."""
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    doc = Document(io.BytesIO(file_bytes))
+    # Walk the body's <w:p> elements once instead of building the
+    # doc.paragraphs proxy list; every 20 paragraphs count as a page.
+    texts, num_paragraphs = [], 0
+    for p in doc.element.body.iterchildren(qn("w:p")):
+        num_paragraphs += 1
+        p_text = p.text
+        if p_text:
+            texts.append(p_text)
+    return "\n".join(texts), num_paragraphs // 20 + 1, False
+
+def _extract_txt(file_bytes, pdf_mode):
+    """Decode plain-text bytes; each line counts as a page."""
+    text = file_bytes.decode("utf-8", errors="ignore")
+    return text, len(text.split('\n')), False
+
+# Extractor per lower-cased file extension; anything else is read as text.
+# Every extractor takes (file_bytes, pdf_mode) and returns
+# (text, pages, truncated); only the PDF extractor uses the mode.
+_EXTRACTORS = {".pdf": _extract_pdf, ".docx": _extract_docx}
+
+@st.cache_data(show_spinner=False, max_entries=EXTRACT_CACHE_MAX_ENTRIES, persist=EXTRACT_CACHE_PERSIST)
+def extract_text_from_file(file_bytes, filename, pdf_mode="text"):
+    """Extract text from DOCX, PDF, or TXT file bytes.
+
+    Keyed on the raw bytes, so reruns and new sessions with the same
+    upload skip re-parsing the document; with EXTRACT_CACHE_PERSIST=1
+    the cache also survives restarts. The returned (text, pages,
+    truncated) tuple is shared by every caller and must be treated as
+    read-only. A truncated result is cached like any other, so reruns
+    get the same partial text without spending the time budget again.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    return _EXTRACTORS.get(ext, _extract_txt)(file_bytes, pdf_mode)
+
+async def stream_chat_response(prompt, model="gpt-4o-mini", to_language=None, placeholder=None):
+    """Stream a ChatGPT answer, translating finished sentences as later ones generate.
+
+    The OpenAI stream feeds complete sentences into a queue; the consumer
+    translates each one (when ``to_language`` is set) and renders the
+    running answer into ``placeholder``. Returns the full answer.
+    """
+    from openai import AsyncOpenAI
+
+    queue = asyncio.Queue()
+    parts = []
+    errors = []
+
+    async def produce():
+        buffer = ""
+        try:
+            async with AsyncOpenAI(api_key=OPENAI_API_KEY) as aclient:
+                stream = await aclient.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=2048,
+                    temperature=0.7,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    buffer += chunk.choices[0].delta.content or ""
+                    start = 0
+                    for match in _SENTENCE_END_RE.finditer(buffer):
+                        line_start = max(start, buffer.rfind("\n", start, match.start()) + 1)
+                        if _LIST_MARKER_RE.fullmatch(buffer, line_start, match.end()):
+                            continue
+                        await queue.put(buffer[start:match.end()])
+                        start = match.end()
+                    buffer = buffer[start:]
+            if buffer.strip():
+                await queue.put(buffer)
+        finally:
+            await queue.put(None)
+
+    async def consume():
+        translator = None
+        if to_language:
+            try:
+                translator = get_translator()
+            except Exception as e:
+                errors.append(e)  # Stream the answer untranslated instead
+        while (sentence := await queue.get()) is not None:
+            body = sentence.strip()
+            if translator is not None and body:
+                try:
+                    translated = await asyncio.to_thread(_azure_translate, translator, body, to_language)
+                except Exception as e:
+                    errors.append(e)  # Keep the untranslated sentence rather than dropping it
+                else:
+                    # Re-attach the surrounding whitespace so breaks are preserved
+                    lead = sentence[:len(sentence) - len(sentence.lstrip())]
+                    sentence = lead + translated + sentence[len(sentence.rstrip()):]
+            parts.append(sentence)
+            if placeholder is not None:
+                placeholder.markdown("".join(parts))
+
+    await asyncio.gather(produce(), consume())
+    if errors:
+        st.warning(f"Translation error: {errors[0]}. Part of this answer is shown untranslated.")
+    return "".join(parts).strip()
+
+def compact_contract_text(text):
+    """Strip page footers and confidentiality banners, then collapse whitespace.
+
+    Only used for prompt text; the document shown to the user is untouched.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    kept = [line for line in lines if line and not _BOILERPLATE_LINE_RE.match(line)]
+    return _WHITESPACE_RE.sub(" ", " ".join(kept)).strip()
 
 def query_huggingface(model_id, token, text, country=""):
     """Send text to the Hugging Face inference API."""
-    headers = {"Authorization": f"Bearer {token}"}
+    import requests
+
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     API_URL = f"https://api-inference.huggingface.co/models/{model_id}"
     
-    if country:
-        prompt = f"""Based on the following text that is taken from a contract document, and based on the laws of {country},
-        analyze it for:
-        1 - Key contract information and parties
-        2 - Missing critical information
-        3 - Potential legal risks and non-standard clauses
-        4 - Recommendations for improvements
-        5 - Overall legal assessment
-        Text from legal document: {text}"""
-    else:
-        prompt = f"""Based on the following text that is taken from a contract document,
-        analyze it for:
-        0- which parties does this conract fevor more "answer only by it name at first line"?
-        1 - Key contract information and parties
-        2 - Missing critical information
-        3 - Potential legal risks and non-standard clauses
-        4 - Recommendations for improvements
-        5 - Overall legal assessment
-        Text from legal document: {text}"""
-    
+    prompt = _HF_PROMPT.format(
+        country_clause=f", and based on the laws of {country}," if country else ",",
+        favour_item="" if country else _HF_FAVOUR_ITEM,
+        text=compact_contract_text(text),
+    )
+
     payload = {"inputs": prompt, "parameters": {"max_new_tokens": 1024}}
     try:
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+        response = requests.post(API_URL, headers=headers, data=orjson.dumps(payload), timeout=120)
         return response
     except Exception as e:
         return None
@@ -155,6 +355,137 @@ def query_huggingface(model_id, token, text, country=""):
 # 🎨 UI CONFIGURATION
 # ------------------------------------------------------------
 
+# Static markup is built once at import; main() re-emits it on every rerun
+# because Streamlit drops any element a rerun does not render again.
+_CSS_BLOCK = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
+
+* {
+    font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
+}
+
+#MainMenu {visibility: hidden;}
+footer {visibility: hidden;}
+header {visibility: hidden;}
+
+.main {
+    background-color: #FAFAFA;
+    padding-top: 0 !important;
+}
+
+.stButton>button {
+    background: linear-gradient(90deg, #1E8C7E 0%, #2AB598 100%);
+    color: white !important;
+    border-radius: 12px;
+    padding: 0.75rem 2rem;
+    font-weight: 600;
+    border: none;
+    box-shadow: 0 4px 16px rgba(30, 140, 126, 0.3);
+    transition: all 0.3s ease;
+    font-size: 1rem;
+}
+
+.output-box {
+    background: rgba(30, 140, 126, 0.05);
+    border: 2px solid #1E8C7E;
+    border-radius: 15px;
+    padding: 1.5rem;
+    margin: 1rem 0;
+    min-height: 150px;
+}
+
+.chat-container {
+    max-width: 900px;
+    margin: 0 auto;
+    padding: 2rem 1rem;
+}
+
+.chat-box-user {
+    background: #F5F5F5;
+    border-radius: 24px;
+    padding: 1.5rem 2rem;
+    margin-bottom: 1.5rem;
+    display: flex;
+    align-items: flex-start;
+    gap: 1rem;
+    max-width: 85%;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.04);
+    animation: slideInLeft 0.6s ease-out;
+}
+
+.chat-box-ai {
+    background: #FFFFFF;
+    border-radius: 24px;
+    padding: 1.5rem 2rem;
+    margin-bottom: 1.5rem;
+    margin-left: auto;
+    display: flex;
+    align-items: flex-start;
+    gap: 1rem;
+    max-width: 85%;
+    box-shadow: 0 4px 16px rgba(0,0,0,0.08);
+    animation: slideInRight 0.6s ease-out 0.3s both;
+}
+</style>
+"""
+
+_HERO_HTML = """
+<div style="text-align: center; padding: 0.5rem 2rem 2rem 2rem; max-width: 1200px; margin: 0 auto;">
+    <h1 style="font-size: 4rem; font-weight: 800; line-height: 1.2; margin-bottom: 1rem; margin-top: 0;">
+        <span style="color: #2D3748;">Analyze your Contracts</span><br>
+        <span style="color: #A0AEC0;">with</span>
+        <span style="color: #1E8C7E;"> Naja7</span>
+    </h1>
+    <p style="font-size: 1.3rem; color: #718096; max-width: 800px; margin: 0 auto 2rem auto; line-height: 1.6;">
+        Upload your PDF and Word documents to extract, analyze, and understand contract content with AI-powered insights.
+    </p>
+</div>
+"""
+
+@st.fragment
+def render_chat():
+    """Chat panel. Runs as a fragment, so sending a question reruns only this panel."""
+    st.markdown("### 💬 Chat with AI")
+
+    # Display chat messages; new exchanges are appended to the same container
+    # so they stay above the form instead of rendering below it
+    history = st.container()
+    for message in st.session_state.messages:
+        with history.chat_message(message["role"]):
+            st.write(message["content"])
+
+    # Chat input + manual submit option; the form batches edits into one rerun on Send
+    with st.form("chat_form", clear_on_submit=False):
+        user_question = st.text_input("Ask about the document...", key="chat_question")
+        send_button = st.form_submit_button("Send")
+
+    if send_button and user_question:
+        st.session_state.messages.append({"role": "user", "content": user_question})
+        with history.chat_message("user"):
+            st.write(user_question)
+
+        # Create context from analysis
+        context = f"""Based on this analysis of the legal document:
+        {st.session_state.analysis_result}
+
+        Answer this question: {user_question}"""
+
+        # Get response from GPT-4o-mini, translating back sentence by sentence if needed
+        to_language = "ar" if st.session_state.original_language == "ar" else None
+        with history.chat_message("assistant"):
+            placeholder = st.empty()
+            try:
+                response = asyncio.run(stream_chat_response(
+                    context, model="gpt-4o-mini", to_language=to_language, placeholder=placeholder
+                ))
+            except Exception:
+                response = "Error: Could not get response from ChatGPT"
+                placeholder.write(response)
+
+        # Store assistant message
+        st.session_state.messages.append({"role": "assistant", "content": response})
+
 def main():
     st.set_page_config(
         page_title="Contract Analysis",
@@ -164,97 +495,21 @@ def main():
     )
 
     # Custom CSS styling
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-        
-        * {
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-        }
-        
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-        header {visibility: hidden;}
-        
-        .main {
-            background-color: #FAFAFA;
-            padding-top: 0 !important;
-        }
-        
-        .stButton>button {
-            background: linear-gradient(90deg, #1E8C7E 0%, #2AB598 100%);
-            color: white !important;
-            border-radius: 12px;
-            padding: 0.75rem 2rem;
-            font-weight: 600;
-            border: none;
-            box-shadow: 0 4px 16px rgba(30, 140, 126, 0.3);
-            transition: all 0.3s ease;
-            font-size: 1rem;
-        }
-        
-        .output-box {
-            background: rgba(30, 140, 126, 0.05);
-            border: 2px solid #1E8C7E;
-            border-radius: 15px;
-            padding: 1.5rem;
-            margin: 1rem 0;
-            min-height: 150px;
-        }
-        
-        .chat-container {
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 2rem 1rem;
-        }
-        
-        .chat-box-user {
-            background: #F5F5F5;
-            border-radius: 24px;
-            padding: 1.5rem 2rem;
-            margin-bottom: 1.5rem;
-            display: flex;
-            align-items: flex-start;
-            gap: 1rem;
-            max-width: 85%;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.04);
-            animation: slideInLeft 0.6s ease-out;
-        }
-        
-        .chat-box-ai {
-            background: #FFFFFF;
-            border-radius: 24px;
-            padding: 1.5rem 2rem;
-            margin-bottom: 1.5rem;
-            margin-left: auto;
-            display: flex;
-            align-items: flex-start;
-            gap: 1rem;
-            max-width: 85%;
-            box-shadow: 0 4px 16px rgba(0,0,0,0.08);
-            animation: slideInRight 0.6s ease-out 0.3s both;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_CSS_BLOCK, unsafe_allow_html=True)
 
     # Hero section
-    st.markdown("""
-    <div style="text-align: center; padding: 0.5rem 2rem 2rem 2rem; max-width: 1200px; margin: 0 auto;">
-        <h1 style="font-size: 4rem; font-weight: 800; line-height: 1.2; margin-bottom: 1rem; margin-top: 0;">
-            <span style="color: #2D3748;">Analyze your Contracts</span><br>
-            <span style="color: #A0AEC0;">with</span>
-            <span style="color: #1E8C7E;"> Naja7</span>
-        </h1>
-        <p style="font-size: 1.3rem; color: #718096; max-width: 800px; margin: 0 auto 2rem auto; line-height: 1.6;">
-            Upload your PDF and Word documents to extract, analyze, and understand contract content with AI-powered insights.
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_HERO_HTML, unsafe_allow_html=True)
 
     # Sidebar configuration
     st.sidebar.markdown("## Settings")
     hf_model_id_input = st.sidebar.text_input("HF Model ID", value=HF_MODEL_ID)
     st.sidebar.caption("Change this if you get a 404: verify the exact model repo name.")
+    with st.sidebar.expander("Advanced"):
+        pdf_mode = st.radio(
+            "PDF text mode",
+            PDF_TEXT_MODES,
+            help="'text' follows reading order; try 'blocks' if columns come out interleaved."
+        )
 
     # HF Token control
     hf_token_input = st.sidebar.text_input("HF Token", value=st.session_state.hf_token, type="password")
@@ -279,157 +534,183 @@ def main():
             country = st.text_input("Specify country/region (Optional)", "")
             submitted = st.form_submit_button("Analyze")
         if uploaded_file:
-            # Step 1: Process uploaded file and handle translation
-            with st.spinner("Processing document..."):
-                text, num_pages = extract_text_from_file(uploaded_file)
+            # Reruns triggered by the chat or sidebar reuse the processed document
+            is_pdf = uploaded_file.name.lower().endswith(".pdf")
+            upload_sig = (uploaded_file.file_id, country, hf_model_id_input, pdf_mode if is_pdf else None)
+            if st.session_state.processed_doc and st.session_state.processed_doc[0] == upload_sig:
+                _, text, lang, truncated = st.session_state.processed_doc
+                st.status(
+                    "Analysis complete (partial document)" if truncated else "Analysis complete",
+                    state="complete",
+                    expanded=False,
+                )
+            else:
+                # Step 1: Process uploaded file and handle translation
+                with st.status("Processing document...", expanded=True) as status:
+                    file_bytes = uploaded_file.getvalue()
+                    text, num_pages, truncated = extract_text_from_file(file_bytes, uploaded_file.name, pdf_mode)
                 
-                if not text.strip():
-                    st.error(f"The file {uploaded_file.name} appears to be empty or unreadable.")
-                    return
+                    if not text.strip():
+                        status.update(label="Could not read the document", state="error")
+                        if is_pdf:
+                            st.error(
+                                f"The file {uploaded_file.name} contains no extractable text: "
+                                "it may be blank or a scan without a text layer."
+                            )
+                        else:
+                            st.error(f"The file {uploaded_file.name} appears to be empty or unreadable.")
+                        return
 
-                # Detect language
-                try:
-                    lang = detect(text[:500])
-                    st.session_state.original_language = lang
-                    st.info(f"Detected language: {lang.upper()}")
-                except:
-                    lang = "unknown"
-                    st.session_state.original_language = "en"
-                    st.warning("Could not detect language, proceeding with analysis...")
-
-                # Translate if Arabic
-                if lang == "ar":
-                    with st.spinner("Translating Arabic text to English..."):
+                    # Detect language
+                    try:
+                        lang = detect_language(text[:500])
+                        st.session_state.original_language = lang
+                        st.info(f"Detected language: {lang.upper()}")
+                    except:
+                        lang = "unknown"
+                        st.session_state.original_language = "en"
+                        st.warning("Could not detect language, proceeding with analysis...")
+
+                    # Translate if Arabic
+                    if lang == "ar":
+                        status.update(label="Translating Arabic text to English...")
+                        # Call the cached helper directly: translate_text() hides
+                        # failures, which would be analysed and stored as English
                         try:
-                            text = translate_text(text, to_language="en")
+                            text = _translate(text, "en")
                         except Exception as e:
+                            status.update(label="Translation failed", state="error")
                             st.error(f"Translation error: {e}")
                             return
 
-            # Display document content
-            with st.expander("📄 Document Content", expanded=False):
-                st.text_area("Content", text, height=200)
-
-            # Step 2: Process with HuggingFace model
-            with st.spinner("Performing initial legal analysis..."):
-                st.session_state.hf_result = None
-                if not st.session_state.hf_token:
-                    st.warning("Hugging Face token is not set. Please configure HF_TOKEN to use the HF model.")
-                else:
-                    try:
-                        hf_response = query_huggingface(hf_model_id_input, st.session_state.hf_token, text, country)
+                    # Step 2: Process with HuggingFace model
+                    status.update(label="Performing initial legal analysis...")
+                    # Reuse the previous result while text, country and model are unchanged
+                    hf_key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), country, hf_model_id_input)
+                    if st.session_state.hf_key != hf_key or not st.session_state.hf_result:
                         st.session_state.hf_result = None
-
-                        # Handle no response (network/timeout)
-                        if hf_response is None:
-                            st.warning("Could not reach Hugging Face Inference API (network/timeout).")
+                        if not st.session_state.hf_token:
+                            st.warning("Hugging Face token is not set. Please configure HF_TOKEN to use the HF model.")
                         else:
-                            # Handle model loading (503) with limited retries
-                            if hf_response.status_code == 503:
-                                try:
-                                    payload = hf_response.json()
-                                except Exception:
-                                    payload = {}
-                                estimated = payload.get("estimated_time", 10)
-                                st.info(f"HF model is loading. Retrying in {int(estimated)}s...")
-                                time.sleep(min(int(estimated), 15))
-                                # Retry a couple of times
-                                for _ in range(2):
-                                    retry_resp = query_huggingface(hf_model_id_input, st.session_state.hf_token, text, country)
-                                    if retry_resp is not None and retry_resp.status_code == 200:
-                                        hf_response = retry_resp
-                                        break
-                                    time.sleep(2)
-
-                            # If OK, parse output
-                            if hf_response is not None and hf_response.status_code == 200:
-                                try:
-                                    data = hf_response.json()
-                                    if isinstance(data, dict) and "generated_text" in data:
-                                        st.session_state.hf_result = data["generated_text"]
-                                    elif isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict) and "generated_text" in data[0]:
-                                        st.session_state.hf_result = data[0]["generated_text"]
-                                    else:
-                                        st.warning("HF response received but in an unexpected format. Showing raw output below.")
-                                        st.code(str(data))
-                                except Exception as parse_err:
-                                    st.error(f"Failed to parse HF response: {parse_err}")
-                            elif hf_response is not None:
-                                # Show precise error for common statuses
-                                try:
-                                    err_text = hf_response.text
-                                except Exception:
-                                    err_text = ""
-                                if hf_response.status_code in (401, 403):
-                                    st.error("Hugging Face authorization failed (check HF_TOKEN permissions or model visibility).")
-                                elif hf_response.status_code == 404:
-                                    st.error("HF model not found (404). Please verify the model ID in the sidebar.")
-                                else:
-                                    st.warning(f"HF model request failed: {hf_response.status_code}. Details: {err_text[:500]}")
-                    except Exception as e:
-                        st.warning(f"Initial analysis error: {str(e)}")
+                            try:
+                                hf_response = query_huggingface(hf_model_id_input, st.session_state.hf_token, text, country)
+                                st.session_state.hf_result = None
 
-            # Step 3: Process with GPT using HF insights
-            with st.spinner("Performing comprehensive analysis..."):
-                if st.session_state.hf_result:
-                    # ✅ Use only Hugging Face analysis (no GPT)
-                    st.session_state.analysis_result = st.session_state.hf_result
+                                # Handle no response (network/timeout)
+                                if hf_response is None:
+                                    st.warning("Could not reach Hugging Face Inference API (network/timeout).")
+                                else:
+                                    # Handle model loading (503) with limited retries
+                                    if hf_response.status_code == 503:
+                                        try:
+                                            payload = orjson.loads(hf_response.content)
+                                        except Exception:
+                                            payload = {}
+                                        estimated = payload.get("estimated_time", 10)
+                                        st.info(f"HF model is loading. Retrying in {int(estimated)}s...")
+                                        time.sleep(min(int(estimated), 15))
+                                        # Retry a couple of times
+                                        for _ in range(2):
+                                            retry_resp = query_huggingface(hf_model_id_input, st.session_state.hf_token, text, country)
+                                            if retry_resp is not None and retry_resp.status_code == 200:
+                                                hf_response = retry_resp
+                                                break
+                                            time.sleep(2)
+
+                                    # If OK, parse output
+                                    if hf_response is not None and hf_response.status_code == 200:
+                                        try:
+                                            data = orjson.loads(hf_response.content)
+                                            if isinstance(data, dict) and "generated_text" in data:
+                                                st.session_state.hf_result = data["generated_text"]
+                                            elif isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict) and "generated_text" in data[0]:
+                                                st.session_state.hf_result = data[0]["generated_text"]
+                                            else:
+                                                st.warning("HF response received but in an unexpected format. Showing raw output below.")
+                                                st.code(str(data))
+                                        except Exception as parse_err:
+                                            st.error(f"Failed to parse HF response: {parse_err}")
+                                    elif hf_response is not None:
+                                        # Show precise error for common statuses
+                                        try:
+                                            err_text = hf_response.text
+                                        except Exception:
+                                            err_text = ""
+                                        if hf_response.status_code in (401, 403):
+                                            st.error("Hugging Face authorization failed (check HF_TOKEN permissions or model visibility).")
+                                        elif hf_response.status_code == 404:
+                                            st.error("HF model not found (404). Please verify the model ID in the sidebar.")
+                                        else:
+                                            st.warning(f"HF model request failed: {hf_response.status_code}. Details: {err_text[:500]}")
+                            except Exception as e:
+                                st.warning(f"Initial analysis error: {str(e)}")
+                        if st.session_state.hf_result:
+                            st.session_state.hf_key = hf_key
+
+                    # Step 3: Process with GPT using HF insights
+                    status.update(label="Performing comprehensive analysis...")
+                    if st.session_state.hf_result and st.session_state.hf_result != st.session_state.analysis_result:
+                        # ✅ Use only Hugging Face analysis (no GPT)
+                        st.session_state.analysis_result = st.session_state.hf_result
+                        st.session_state.analysis_chunks = st.session_state.hf_result.splitlines(keepends=True)
+
+                    if st.session_state.hf_result:
+                        status.update(
+                            label="Analysis complete (partial document)" if truncated else "Analysis complete",
+                            state="complete",
+                            expanded=False,
+                        )
+                        st.session_state.processed_doc = (upload_sig, text, lang, truncated)
+                    else:
+                        # Keep the box open so the HF warnings above stay visible
+                        status.update(label="Initial analysis unavailable", state="error")
+
+            if truncated:
+                # Shown outside the status box so it stays visible once it collapses
+                st.warning(
+                    f"PDF extraction hit the {PDF_EXTRACT_BUDGET_S}s time limit; "
+                    "only part of the document was analyzed."
+                )
 
+            # Display document content
+            with st.expander("📄 Document Content", expanded=False):
+                # Expander bodies are always sent to the browser, so the text
+                # is only rendered once the user asks for it
+                if st.toggle("Load content", key="show_document_content"):
+                    # Only a bounded preview goes over the websocket; analysis uses the full text
+                    preview = text
+                    if len(text) > PREVIEW_LIMIT:
+                        preview = text[:PREVIEW_LIMIT] + f"\n\n... [{len(text) - PREVIEW_LIMIT} chars truncated]"
+                    st.text_area("Content", preview, height=200)
 
             st.markdown("###Analysis Results")
-            st.write(st.session_state.analysis_result)
+            if st.session_state.analysis_chunks:
+                # Stream a fresh result once; later reruns render the finished text
+                st.write_stream(iter(st.session_state.analysis_chunks))
+                st.session_state.analysis_chunks = None
+            else:
+                st.write(st.session_state.analysis_result)
 
             # Translate back to Arabic if needed
             if lang == "ar":
-                with st.spinner("Translating analysis to Arabic..."):
+                arabic_response = None
+                with st.status("Translating analysis to Arabic...") as status:
                     try:
-                        arabic_response = translate_text(st.session_state.analysis_result, to_language="ar")
-                        st.markdown("### 🔄 Arabic Translation")
-                        st.markdown('<div class="output-box">', unsafe_allow_html=True)
-                        st.write(arabic_response)
-                        st.markdown('</div>', unsafe_allow_html=True)
+                        arabic_response = _translate(st.session_state.analysis_result, "ar")
                     except Exception as e:
+                        status.update(label="Arabic translation failed", state="error")
                         st.error(f"Translation error: {e}")
+                    else:
+                        status.update(label="Arabic translation ready", state="complete", expanded=False)
+                if arabic_response is not None:
+                    st.markdown("### 🔄 Arabic Translation")
+                    st.markdown('<div class="output-box">', unsafe_allow_html=True)
+                    st.write(arabic_response)
+                    st.markdown('</div>', unsafe_allow_html=True)
 
     # Chat interface in the second column
     with col2:
-        st.markdown("### 💬 Chat with AI")
-        
-        # Display chat messages
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.write(message["content"])
-
-        # Chat input
-# Chat input + manual submit option
-    chat_col = st.container()
-    with chat_col:
-        user_question = st.text_input("Ask about the document...", key="chat_question")
-        send_button = st.button("Send")
-
-    if send_button and user_question:
-        st.session_state.messages.append({"role": "user", "content": user_question})
-
-    # Create context from analysis
-        context = f"""Based on this analysis of the legal document:
-        {st.session_state.analysis_result}
-    
-        Answer this question: {user_question}"""
-
-    # Get response from GPT-4o-mini
-        response = get_chatgpt_response(context, model="gpt-4o-mini")
-
-    # Translate back if needed
-        if st.session_state.original_language == "ar":
-            try:
-                response = translate_text(response, to_language="ar")
-            except Exception as e:
-                st.error(f"Translation error: {e}")
-
-    # Store assistant message
-        st.session_state.messages.append({"role": "assistant", "content": response})
-
-    # (No duplicate rendering here.) Messages are displayed above in the chat column.
+        render_chat()
 
 
 if __name__ == "__main__":